@@ -1,11 +1,13 @@
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 
 from app.routers import analysis, health
-from app.services.firebase_service import initialize_firebase
+from app.services.firebase_service import initialize_firebase, warm_firestore
 from app.services.gee_service import initialize_gee
+from app.services.pipeline import start_pipeline_workers
 
 load_dotenv()
 
@@ -13,6 +15,7 @@ app = FastAPI(
     title="CropHealth AI API",
     description="Crop health monitoring using Sentinel-1 SAR data and LSTM",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 origins = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
@@ -27,7 +30,9 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup():
     initialize_firebase()
+    warm_firestore()
     initialize_gee()
+    start_pipeline_workers()
 
 
 app.include_router(health.router, tags=["Health"])
@@ -5,7 +5,7 @@ from fastapi import APIRouter, HTTPException, Depends
 
 from app.schemas.analysis import AnalysisRequest, AnalysisResponse, AnalysisResult
 from app.services.firebase_service import get_firestore_client
-from app.services.pipeline import run_analysis_pipeline
+from app.services.pipeline import submit_analysis_job
 from app.services.auth_service import verify_firebase_token
 
 router = APIRouter()
@@ -20,18 +20,18 @@ async def create_analysis(
 
     db = get_firestore_client()
     job_ref = db.collection("analysis_jobs").document(job_id)
-    job_ref.set({
+    await asyncio.to_thread(job_ref.set, {
         "job_id": job_id,
         "user_id": user_id,
         "status": "pending",
-        "aoi_geojson": json.dumps(request.aoi_geojson),
+        "aoi_geojson": json.dumps(request.aoi_geojson.model_dump()),
         "start_date": request.start_date,
         "end_date": request.end_date,
         "crop_type": request.crop_type,
         "season": request.season,
     })
 
-    asyncio.create_task(run_analysis_pipeline(job_id, request))
+    await submit_analysis_job(job_id, request)
 
     return AnalysisResponse(
         job_id=job_id,
@@ -47,7 +47,7 @@ async def get_result(
 ):
     db = get_firestore_client()
     job_ref = db.collection("analysis_jobs").document(job_id)
-    doc = job_ref.get()
+    doc = await asyncio.to_thread(job_ref.get)
 
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -73,21 +73,22 @@ async def list_jobs(
     user_id: str = Depends(verify_firebase_token),
 ):
     db = get_firestore_client()
-    jobs = (
+    query = (
         db.collection("analysis_jobs")
         .where("user_id", "==", user_id)
         .order_by("start_date")
-        .stream()
+        .select(["job_id", "status", "warning", "error"])
+        .limit(50)
     )
+    jobs = await asyncio.to_thread(lambda: list(query.stream()))
 
+    # These documents were written by this app, so skip re-validation.
     results = []
     for doc in jobs:
         data = doc.to_dict()
-        results.append(AnalysisResult(
+        results.append(AnalysisResult.model_construct(
             job_id=data["job_id"],
             status=data.get("status", "pending"),
-            prediction=data.get("prediction"),
-            time_series=data.get("time_series"),
             warning=data.get("warning"),
             error=data.get("error"),
         ))
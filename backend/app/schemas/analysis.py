@@ -1,5 +1,5 @@
-from pydantic import BaseModel, field_validator
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Literal, Optional, Union
 from datetime import date
 
 
@@ -8,8 +8,19 @@ class Coordinate(BaseModel):
     lng: float
 
 
+class GeoJSONPolygon(BaseModel):
+    type: Literal["Polygon"]
+    coordinates: list[list[list[float]]]
+
+
+class GeoJSONFeature(BaseModel):
+    type: Literal["Feature"]
+    geometry: GeoJSONPolygon
+    properties: Optional[dict] = None
+
+
 class AnalysisRequest(BaseModel):
-    aoi_geojson: dict
+    aoi_geojson: Union[GeoJSONPolygon, GeoJSONFeature] = Field(discriminator="type")
     start_date: str
     end_date: str
     crop_type: Optional[str] = None
@@ -24,13 +35,6 @@ class AnalysisRequest(BaseModel):
             raise ValueError(f"Invalid date format: {v}. Use YYYY-MM-DD.")
         return v
 
-    @field_validator("aoi_geojson")
-    @classmethod
-    def validate_geojson(cls, v):
-        if v.get("type") not in ("Polygon", "Feature"):
-            raise ValueError("aoi_geojson must be a GeoJSON Polygon or Feature.")
-        return v
-
 
 class AnalysisResponse(BaseModel):
     job_id: str
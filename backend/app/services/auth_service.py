@@ -1,15 +1,45 @@
+import time
+import hashlib
 from fastapi import HTTPException, Header
 from firebase_admin import auth
 
+# Verified tokens are cached by hash so repeat requests from the same client
+# skip the RSA signature check. Entries expire with the token's own `exp`,
+# capped at 5 minutes to bound how long a revoked token stays usable.
+_token_cache: dict[bytes, tuple[str, float]] = {}
+_TOKEN_CACHE_MAX = 10_000
+_TOKEN_CACHE_TTL = 300
+
 
 async def verify_firebase_token(authorization: str = Header(...)) -> str:
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization header format")
 
-    token = authorization.replace("Bearer ", "")
+    token = authorization[7:]
+
+    # JWTs always have exactly two dots; reject obvious garbage before
+    # paying for a signature verification.
+    if len(token) < 100 or token.count(".") != 2:
+        raise HTTPException(status_code=401, detail="Malformed token")
+
+    key = hashlib.blake2b(token.encode()).digest()
+    cached = _token_cache.get(key)
+    if cached is not None:
+        uid, expires_at = cached
+        if expires_at > time.time():
+            return uid
+        del _token_cache[key]
 
     try:
         decoded = auth.verify_id_token(token)
-        return decoded["uid"]
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid or expired token: {str(e)}")
+
+    if len(_token_cache) >= _TOKEN_CACHE_MAX:
+        _token_cache.clear()
+
+    now = time.time()
+    expires_at = min(float(decoded.get("exp", now)), now + _TOKEN_CACHE_TTL)
+    _token_cache[key] = (decoded["uid"], expires_at)
+
+    return decoded["uid"]
@@ -1,12 +1,10 @@
 import os
+from functools import lru_cache
 import firebase_admin
 from firebase_admin import credentials, firestore
 
-_db = None
-
 
 def initialize_firebase():
-    global _db
     cred_path = os.getenv("FIREBASE_CREDENTIALS_PATH", "./firebase-service-account-key.json")
 
     if not firebase_admin._apps:
@@ -15,12 +13,21 @@ def initialize_firebase():
             "projectId": os.getenv("FIREBASE_PROJECT_ID"),
         })
 
-    _db = firestore.client()
     print("[Firebase] Initialized successfully")
 
 
+@lru_cache(maxsize=1)
 def get_firestore_client():
-    global _db
-    if _db is None:
+    if not firebase_admin._apps:
         initialize_firebase()
-    return _db
+    return firestore.client()
+
+
+def warm_firestore():
+    """Force the gRPC channel to connect so the first real request
+    does not pay the ~100-300 ms setup cost."""
+    try:
+        get_firestore_client().collection("analysis_jobs").limit(1).get()
+        print("[Firebase] Firestore channel warmed")
+    except Exception as e:
+        print(f"[Firebase] Firestore warm-up read failed: {e}")
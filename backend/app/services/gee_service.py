@@ -1,9 +1,29 @@
+import math
 import os
 import ee
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
+# 10 ** (x / 10) == exp(x * ln(10) / 10); multiply + exp is cheaper
+# server-side than pow and avoids allocating ee.Image(10) per image.
+_LN10_OVER_10 = math.log(10) / 10
+
+# Built lazily because ee server objects cannot be constructed before
+# ee.Initialize() has run; shared across all fetches afterwards.
+_stats_reducer = None
+
+
+def _get_stats_reducer():
+    global _stats_reducer
+    if _stats_reducer is None:
+        _stats_reducer = (
+            ee.Reducer.mean()
+            .combine(ee.Reducer.median(), sharedInputs=True)
+            .combine(ee.Reducer.stdDev(), sharedInputs=True)
+        )
+    return _stats_reducer
+
 
 def initialize_gee():
     try:
@@ -23,13 +43,14 @@ def initialize_gee():
             print(f"[GEE] Default initialization also failed: {e2}")
 
 
-def fetch_sentinel1_timeseries(aoi_geojson: dict, start_date: str, end_date: str) -> pd.DataFrame:
+def build_geometry(aoi_geojson: dict) -> ee.Geometry:
     if aoi_geojson.get("type") == "Feature":
-        geometry = ee.Geometry(aoi_geojson["geometry"])
-    else:
-        geometry = ee.Geometry(aoi_geojson)
+        return ee.Geometry(aoi_geojson["geometry"])
+    return ee.Geometry(aoi_geojson)
+
 
-    collection = (
+def build_s1_collection(geometry: ee.Geometry, start_date: str, end_date: str) -> ee.ImageCollection:
+    return (
         ee.ImageCollection("COPERNICUS/S1_GRD")
         .filterBounds(geometry)
         .filterDate(start_date, end_date)
@@ -39,12 +60,25 @@ def fetch_sentinel1_timeseries(aoi_geojson: dict, start_date: str, end_date: str
         .select(["VV", "VH"])
     )
 
+
+def fetch_sentinel1_timeseries(
+    aoi_geojson: dict,
+    start_date: str,
+    end_date: str,
+    geometry: ee.Geometry = None,
+    collection: ee.ImageCollection = None,
+) -> pd.DataFrame:
+    if geometry is None:
+        geometry = build_geometry(aoi_geojson)
+    if collection is None:
+        collection = build_s1_collection(geometry, start_date, end_date)
+
     def compute_features(image):
         vv = image.select("VV")
         vh = image.select("VH")
 
-        vv_linear = ee.Image(10).pow(vv.divide(10))
-        vh_linear = ee.Image(10).pow(vh.divide(10))
+        vv_linear = vv.multiply(_LN10_OVER_10).exp()
+        vh_linear = vh.multiply(_LN10_OVER_10).exp()
 
         rvi = vh_linear.multiply(4).divide(vv_linear.add(vh_linear)).rename("RVI")
 
@@ -57,33 +91,40 @@ def fetch_sentinel1_timeseries(aoi_geojson: dict, start_date: str, end_date: str
     start = datetime.strptime(start_date, "%Y-%m-%d")
     end = datetime.strptime(end_date, "%Y-%m-%d")
 
-    records = []
+    windows = []
     current = start
     while current < end:
         week_end = current + timedelta(days=10)
         if week_end > end:
             week_end = end
+        windows.append([current.strftime("%Y-%m-%d"), week_end.strftime("%Y-%m-%d")])
+        current = week_end
 
-        composite = (
-            collection_with_features
-            .filterDate(current.strftime("%Y-%m-%d"), week_end.strftime("%Y-%m-%d"))
-            .median()
-        )
+    def per_window(window):
+        window = ee.List(window)
+        window_start = ee.String(window.get(0))
+        window_end = ee.String(window.get(1))
+
+        composite = collection_with_features.filterDate(window_start, window_end).median()
 
         stats = composite.reduceRegion(
-            reducer=ee.Reducer.mean()
-            .combine(ee.Reducer.median(), sharedInputs=True)
-            .combine(ee.Reducer.stdDev(), sharedInputs=True),
+            reducer=_get_stats_reducer(),
             geometry=geometry,
             scale=10,
             maxPixels=1e9,
         )
 
-        stats_dict = stats.getInfo()
+        return ee.Feature(None, stats.set("date", window_start))
 
-        if stats_dict and stats_dict.get("VV_mean") is not None:
+    fc = ee.FeatureCollection(ee.List(windows).map(per_window))
+    feature_dicts = fc.getInfo().get("features", [])
+
+    records = []
+    for feature in feature_dicts:
+        stats_dict = feature.get("properties", {})
+        if stats_dict.get("VV_mean") is not None:
             records.append({
-                "date": current.strftime("%Y-%m-%d"),
+                "date": stats_dict.get("date"),
                 "vv_mean": stats_dict.get("VV_mean"),
                 "vh_mean": stats_dict.get("VH_mean"),
                 "rvi_mean": stats_dict.get("RVI_mean"),
@@ -92,31 +133,25 @@ def fetch_sentinel1_timeseries(aoi_geojson: dict, start_date: str, end_date: str
                 "vv_vh_ratio": stats_dict.get("VV_VH_ratio_mean"),
             })
 
-        current = week_end
-
     df = pd.DataFrame(records)
     return df
 
 
-def get_rvi_map_tile_url(aoi_geojson: dict, start_date: str, end_date: str) -> str:
-    if aoi_geojson.get("type") == "Feature":
-        geometry = ee.Geometry(aoi_geojson["geometry"])
-    else:
-        geometry = ee.Geometry(aoi_geojson)
-
-    collection = (
-        ee.ImageCollection("COPERNICUS/S1_GRD")
-        .filterBounds(geometry)
-        .filterDate(start_date, end_date)
-        .filter(ee.Filter.listContains("transmitterReceiverPolarisation", "VV"))
-        .filter(ee.Filter.listContains("transmitterReceiverPolarisation", "VH"))
-        .filter(ee.Filter.eq("instrumentMode", "IW"))
-        .select(["VV", "VH"])
-    )
+def get_rvi_map_tile_url(
+    aoi_geojson: dict,
+    start_date: str,
+    end_date: str,
+    geometry: ee.Geometry = None,
+    collection: ee.ImageCollection = None,
+) -> str:
+    if geometry is None:
+        geometry = build_geometry(aoi_geojson)
+    if collection is None:
+        collection = build_s1_collection(geometry, start_date, end_date)
 
     def add_rvi(image):
-        vv_linear = ee.Image(10).pow(image.select("VV").divide(10))
-        vh_linear = ee.Image(10).pow(image.select("VH").divide(10))
+        vv_linear = image.select("VV").multiply(_LN10_OVER_10).exp()
+        vh_linear = image.select("VH").multiply(_LN10_OVER_10).exp()
         rvi = vh_linear.multiply(4).divide(vv_linear.add(vh_linear)).rename("RVI")
         return image.addBands(rvi)
 
@@ -1,14 +1,27 @@
 import os
+import threading
 import numpy as np
 import torch
 import joblib
 from models.lstm_model import CropHealthLSTM
 
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
 _model = None
+_session = None
 _scaler = None
+_scaler_mean = None
+_scaler_scale = None
+_load_lock = threading.Lock()
 
 LABELS = ["Healthy", "Normal", "Stressed"]
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "../../models/saved/lstm_model.pt")
+SCRIPTED_MODEL_PATH = os.path.join(os.path.dirname(__file__), "../../models/saved/lstm_model_scripted.pt")
+INT8_MODEL_PATH = os.path.join(os.path.dirname(__file__), "../../models/saved/lstm_model_int8.pt")
+ONNX_MODEL_PATH = os.path.join(os.path.dirname(__file__), "../../models/saved/lstm_model_int8.onnx")
 SCALER_PATH = os.path.join(os.path.dirname(__file__), "../../models/saved/scaler.pkl")
 
 INPUT_SIZE = 5
@@ -19,42 +32,109 @@ SEQ_LENGTH = 12
 
 
 def load_model():
-    global _model, _scaler
+    global _model, _session, _scaler, _scaler_mean, _scaler_scale
 
-    if _model is not None:
+    if _model is not None or _session is not None:
         return
 
-    if os.path.exists(SCALER_PATH):
-        _scaler = joblib.load(SCALER_PATH)
-        print(f"[ML] Scaler loaded from {SCALER_PATH}")
-    else:
-        print(f"[ML] WARNING: No scaler found at {SCALER_PATH}. Using identity scaling.")
-        _scaler = None
-
-    _model = CropHealthLSTM(
-        input_size=INPUT_SIZE,
-        hidden_size=HIDDEN_SIZE,
-        num_layers=NUM_LAYERS,
-        num_classes=NUM_CLASSES,
-    )
-
-    if os.path.exists(MODEL_PATH):
-        state_dict = torch.load(MODEL_PATH, map_location=torch.device("cpu"))
-        _model.load_state_dict(state_dict)
-        print(f"[ML] Model loaded from {MODEL_PATH}")
-    else:
-        print(f"[ML] WARNING: No model found at {MODEL_PATH}. Using untrained model.")
-
-    _model.eval()
+    # Double-checked lock: the pipeline workers race to the first
+    # prediction, and _model/_session must only become visible once the
+    # load (state dict, quantization, compile) has fully finished.
+    with _load_lock:
+        if _model is not None or _session is not None:
+            return
+
+        if os.path.exists(SCALER_PATH):
+            _scaler = joblib.load(SCALER_PATH)
+            _scaler_mean = _scaler.mean_.astype(np.float32)
+            _scaler_scale = _scaler.scale_.astype(np.float32)
+            print(f"[ML] Scaler loaded from {SCALER_PATH}")
+        else:
+            print(f"[ML] WARNING: No scaler found at {SCALER_PATH}. Using identity scaling.")
+            _scaler = None
+
+        # Batch-1 inference gains nothing from intra-op parallelism; one
+        # thread avoids oversubscribing the worker pool.
+        torch.set_num_threads(1)
+
+        # Prefer the ONNX Runtime int8 artifact when both it and onnxruntime
+        # are available — its LSTM kernel beats the torch paths on CPU.
+        if ort is not None and os.path.exists(ONNX_MODEL_PATH):
+            _session = ort.InferenceSession(ONNX_MODEL_PATH, providers=["CPUExecutionProvider"])
+            print(f"[ML] ONNX int8 model loaded from {ONNX_MODEL_PATH}")
+            return
+
+        # Next best: the TorchScript artifacts exported by train_lstm.py
+        # (int8 first); they run without Python dispatch and need no
+        # tracing here.
+        for path in (INT8_MODEL_PATH, SCRIPTED_MODEL_PATH):
+            if os.path.exists(path):
+                model = torch.jit.load(path, map_location="cpu")
+                model.eval()
+                print(f"[ML] Scripted model loaded from {path}")
+                _model = model
+                return
+
+        model = CropHealthLSTM(
+            input_size=INPUT_SIZE,
+            hidden_size=HIDDEN_SIZE,
+            num_layers=NUM_LAYERS,
+            num_classes=NUM_CLASSES,
+        )
+
+        if os.path.exists(MODEL_PATH):
+            state_dict = torch.load(MODEL_PATH, map_location=torch.device("cpu"))
+            # strict=False: checkpoints predating the baked-in normalization
+            # buffers load with identity scaling and use scaler.pkl instead.
+            model.load_state_dict(state_dict, strict=False)
+            print(f"[ML] Model loaded from {MODEL_PATH}")
+        else:
+            print(f"[ML] WARNING: No model found at {MODEL_PATH}. Using untrained model.")
+
+        model.eval()
+
+        # Dynamic int8 quantization routes the LSTM/Linear matmuls through
+        # FBGEMM int8 kernels and shrinks the weights 4x in memory.
+        try:
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.LSTM, torch.nn.Linear}, dtype=torch.qint8
+            )
+            print("[ML] Model quantized to dynamic int8")
+        except Exception as e:
+            print(f"[ML] WARNING: Dynamic quantization failed ({e}). Using FP32 model.")
+
+        # The input shape is fixed at (1, SEQ_LENGTH, INPUT_SIZE): lower the
+        # graph once with Inductor, falling back to TorchScript tracing on
+        # torch builds without a working torch.compile.
+        example = torch.zeros(1, SEQ_LENGTH, INPUT_SIZE)
+        eager_model = model
+        try:
+            model = torch.compile(eager_model, mode="reduce-overhead", dynamic=False)
+            with torch.inference_mode():
+                model(example)  # warm up so the specialized kernel is cached
+            print("[ML] Model compiled with Inductor")
+        except Exception as e:
+            print(f"[ML] WARNING: torch.compile failed ({e}). Falling back to tracing.")
+            try:
+                model = torch.jit.trace(eager_model, example)
+                print("[ML] Model traced with TorchScript")
+            except Exception as e2:
+                model = eager_model
+                print(f"[ML] WARNING: TorchScript tracing failed ({e2}). Using eager model.")
+
+        _model = model
 
 
 def predict_crop_health(features: np.ndarray) -> dict:
     load_model()
 
+    features = np.ascontiguousarray(features, dtype=np.float32)
     df_features = _fill_missing(features)
 
-    if _scaler is not None:
-        df_features = _scaler.transform(df_features)
+    # In-place standardization in FP32; avoids the scaler's FP64 round-trip.
+    if _scaler_mean is not None:
+        df_features -= _scaler_mean
+        df_features /= _scaler_scale
 
     if len(df_features) < SEQ_LENGTH:
         pad_count = SEQ_LENGTH - len(df_features)
@@ -63,11 +143,19 @@ def predict_crop_health(features: np.ndarray) -> dict:
     elif len(df_features) > SEQ_LENGTH:
         df_features = df_features[-SEQ_LENGTH:]
 
-    x = torch.FloatTensor(df_features).unsqueeze(0)
+    if _session is not None:
+        logits = _session.run(None, {"x": df_features[None]})[0][0]
+        probabilities = _softmax(logits)
+    else:
+        # Built per call: predictions run concurrently on the pipeline
+        # workers, so a shared input buffer would race between jobs.
+        x = torch.from_numpy(np.ascontiguousarray(df_features))[None]
 
-    with torch.no_grad():
-        output = _model(x)
-        probabilities = torch.softmax(output, dim=1).squeeze().numpy()
+        # inference_mode is cheaper than no_grad: no autograd
+        # version-counter bookkeeping on any tensor it touches.
+        with torch.inference_mode():
+            output = _model(x)
+            probabilities = torch.softmax(output, dim=1).squeeze().numpy()
 
     healthy_prob = float(probabilities[0])
     normal_prob = float(probabilities[1])
@@ -86,9 +174,27 @@ def predict_crop_health(features: np.ndarray) -> dict:
     }
 
 
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max())
+    return exp / exp.sum()
+
+
 def _fill_missing(features: np.ndarray) -> np.ndarray:
-    import pandas as pd
-    df = pd.DataFrame(features)
-    df = df.ffill().bfill()
-    df = df.fillna(0)
-    return df.values
+    filled = np.array(features, copy=True)
+    n_rows = filled.shape[0]
+    cols = np.arange(filled.shape[1])
+
+    # Forward fill: each NaN takes the value of the last valid row above it.
+    mask = np.isnan(filled)
+    idx = np.where(~mask, np.arange(n_rows)[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    filled = filled[idx, cols]
+
+    # Backward fill for any leading NaNs, then zero out all-NaN columns.
+    mask = np.isnan(filled)
+    idx = np.where(~mask, np.arange(n_rows)[:, None], n_rows - 1)
+    idx = np.minimum.accumulate(idx[::-1], axis=0)[::-1]
+    filled = filled[idx, cols]
+
+    np.nan_to_num(filled, nan=0.0, copy=False)
+    return filled
@@ -1,27 +1,91 @@
+import asyncio
+import hashlib
+import json
 import traceback
 import numpy as np
 import pandas as pd
+from firebase_admin import firestore
 from app.services.firebase_service import get_firestore_client
-from app.services.gee_service import fetch_sentinel1_timeseries, get_rvi_map_tile_url
+from app.services.gee_service import (
+    build_geometry,
+    build_s1_collection,
+    fetch_sentinel1_timeseries,
+    get_rvi_map_tile_url,
+)
 from app.services.ml_service import predict_crop_health
 from app.schemas.analysis import AnalysisRequest
 
+# Jobs are queued and drained by a fixed pool of worker tasks so a burst of
+# /analyze requests cannot over-subscribe GEE, Firestore or the CPU.
+PIPELINE_WORKERS = 4
+
+_job_queue: asyncio.Queue | None = None
+_worker_tasks: list[asyncio.Task] = []
+
+
+def start_pipeline_workers(count: int = PIPELINE_WORKERS):
+    global _job_queue
+    if _job_queue is not None:
+        return
+    _job_queue = asyncio.Queue()
+    for _ in range(count):
+        _worker_tasks.append(asyncio.create_task(_pipeline_worker()))
+    print(f"[Pipeline] Started {count} pipeline workers")
+
+
+async def _pipeline_worker():
+    while True:
+        job_id, request = await _job_queue.get()
+        try:
+            await run_analysis_pipeline(job_id, request)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            _job_queue.task_done()
+
+
+async def submit_analysis_job(job_id: str, request: AnalysisRequest):
+    if _job_queue is None:
+        start_pipeline_workers()
+    await _job_queue.put((job_id, request))
+
 
 async def run_analysis_pipeline(job_id: str, request: AnalysisRequest):
     db = get_firestore_client()
     job_ref = db.collection("analysis_jobs").document(job_id)
 
     try:
-        job_ref.update({"status": "processing"})
+        await asyncio.to_thread(job_ref.update, {"status": "processing"})
 
-        df = fetch_sentinel1_timeseries(
-            aoi_geojson=request.aoi_geojson,
-            start_date=request.start_date,
-            end_date=request.end_date,
-        )
+        aoi_geojson = request.aoi_geojson.model_dump()
+
+        # Client-side ee object construction is cheap; build once and share
+        # between the time-series fetch and the map-tile request.
+        geometry = build_geometry(aoi_geojson)
+        collection = build_s1_collection(geometry, request.start_date, request.end_date)
+
+        cache_key = _s1_cache_key(aoi_geojson, request.start_date, request.end_date)
+        cache_ref = db.collection("s1_cache").document(cache_key)
+        cache_doc = await asyncio.to_thread(cache_ref.get)
+
+        if cache_doc.exists:
+            df = pd.DataFrame(cache_doc.to_dict().get("records", []))
+        else:
+            df = await asyncio.to_thread(
+                fetch_sentinel1_timeseries,
+                aoi_geojson=aoi_geojson,
+                start_date=request.start_date,
+                end_date=request.end_date,
+                geometry=geometry,
+                collection=collection,
+            )
+            await asyncio.to_thread(cache_ref.set, {
+                "records": df.to_dict("records"),
+                "cached_at": firestore.SERVER_TIMESTAMP,
+            })
 
         if df.empty or len(df) < 3:
-            job_ref.update({
+            await asyncio.to_thread(job_ref.update, {
                 "status": "completed",
                 "warning": "Insufficient Sentinel-1 data for this AOI and date range. "
                            f"Only {len(df)} time steps found (minimum 3 required).",
@@ -29,33 +93,37 @@ async def run_analysis_pipeline(job_id: str, request: AnalysisRequest):
             })
             return
 
-        time_series_records = []
-        for _, row in df.iterrows():
-            time_series_records.append({
-                "date": row["date"],
-                "rvi_mean": _safe_float(row.get("rvi_mean")),
-                "rvi_median": _safe_float(row.get("rvi_median")),
-                "rvi_std": _safe_float(row.get("rvi_std")),
-                "vv_mean": _safe_float(row.get("vv_mean")),
-                "vh_mean": _safe_float(row.get("vh_mean")),
-                "vv_vh_ratio": _safe_float(row.get("vv_vh_ratio")),
-            })
+        ts_cols = ["rvi_mean", "rvi_median", "rvi_std", "vv_mean", "vh_mean", "vv_vh_ratio"]
+        numeric = df[ts_cols].astype("float64").round(6)
+        records_frame = numeric.astype(object).where(numeric.notna(), None)
+        records_frame.insert(0, "date", df["date"])
+        time_series_records = records_frame.to_dict("records")
 
         feature_cols = ["rvi_mean", "vv_mean", "vh_mean", "vv_vh_ratio", "rvi_std"]
-        features = df[feature_cols].values
-        prediction = predict_crop_health(features)
+        features = np.ascontiguousarray(df[feature_cols].to_numpy(dtype=np.float32))
 
-        rvi_map_url = None
-        try:
-            rvi_map_url = get_rvi_map_tile_url(
-                aoi_geojson=request.aoi_geojson,
+        # Inference is CPU-bound and the map tile is a remote GEE call;
+        # they are independent, so overlap them.
+        prediction, rvi_map_url = await asyncio.gather(
+            asyncio.to_thread(predict_crop_health, features),
+            asyncio.to_thread(
+                get_rvi_map_tile_url,
+                aoi_geojson=aoi_geojson,
                 start_date=request.start_date,
                 end_date=request.end_date,
-            )
-        except Exception as e:
-            print(f"[Pipeline] RVI map generation failed: {e}")
+                geometry=geometry,
+                collection=collection,
+            ),
+            return_exceptions=True,
+        )
 
-        job_ref.update({
+        if isinstance(prediction, BaseException):
+            raise prediction
+        if isinstance(rvi_map_url, BaseException):
+            print(f"[Pipeline] RVI map generation failed: {rvi_map_url}")
+            rvi_map_url = None
+
+        await asyncio.to_thread(job_ref.update, {
             "status": "completed",
             "prediction": prediction,
             "time_series": time_series_records,
@@ -64,17 +132,12 @@ async def run_analysis_pipeline(job_id: str, request: AnalysisRequest):
 
     except Exception as e:
         traceback.print_exc()
-        job_ref.update({
+        await asyncio.to_thread(job_ref.update, {
             "status": "failed",
             "error": str(e),
         })
 
 
-def _safe_float(value) -> float | None:
-    if value is None:
-        return None
-    try:
-        f = float(value)
-        return None if np.isnan(f) else round(f, 6)
-    except (ValueError, TypeError):
-        return None
+def _s1_cache_key(aoi_geojson: dict, start_date: str, end_date: str) -> str:
+    payload = json.dumps(aoi_geojson, sort_keys=True) + start_date + end_date
+    return hashlib.blake2b(payload.encode()).hexdigest()
@@ -10,6 +10,11 @@ class CropHealthLSTM(nn.Module):
         self.hidden_size = hidden_size
         self.num_layers = num_layers
 
+        # Feature normalization baked into the model so inference needs no
+        # external scaler; identity by default for older checkpoints.
+        self.register_buffer("feature_mean", torch.zeros(input_size))
+        self.register_buffer("feature_scale", torch.ones(input_size))
+
         self.lstm = nn.LSTM(
             input_size=input_size,
             hidden_size=hidden_size,
@@ -26,6 +31,8 @@ class CropHealthLSTM(nn.Module):
         )
 
     def forward(self, x):
+        x = (x - self.feature_mean) / self.feature_scale
+
         lstm_out, (h_n, _) = self.lstm(x)
 
         last_hidden = h_n[-1]
@@ -7,7 +7,6 @@ import torch.nn as nn
 from torch.utils.data import DataLoader, TensorDataset
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
-import joblib
 
 from models.lstm_model import CropHealthLSTM
 
@@ -17,67 +16,77 @@ NUM_LAYERS = 2
 NUM_CLASSES = 3
 SEQ_LENGTH = 12
 DROPOUT = 0.3
-BATCH_SIZE = 32
+BATCH_SIZE = 256
 EPOCHS = 50
-LEARNING_RATE = 0.001
+LEARNING_RATE = 0.004
+WARMUP_EPOCHS = 3
 
 SAVE_DIR = os.path.join(os.path.dirname(__file__), "saved")
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
 
-def generate_synthetic_data(n_samples=500, seq_length=SEQ_LENGTH, n_features=INPUT_SIZE):
-    X_all = []
-    y_all = []
+def generate_synthetic_data(n_samples=500, seq_length=SEQ_LENGTH, n_features=INPUT_SIZE, seed=None):
+    rng = np.random.default_rng(seed)
 
-    for label in range(3):
-        n = n_samples // 3
+    t = np.linspace(0, 1, seq_length, dtype=np.float32)
+    sin_t = np.sin(2 * np.pi * t)
 
-        for _ in range(n):
-            t = np.linspace(0, 1, seq_length)
+    # Per class: (rvi_lo, rvi_hi, rvi_trend, rvi_sigma, vv_lo, vv_hi, vh_lo, vh_hi, sar_sigma)
+    class_params = [
+        (0.55, 0.8, 0.1 * sin_t, 0.03, -12, -8, -18, -14, 0.5),    # healthy
+        (0.3, 0.55, 0.05 * sin_t, 0.05, -14, -10, -20, -16, 0.8),  # normal
+        (0.1, 0.3, -0.15 * t, 0.06, -16, -12, -22, -18, 1.2),      # stressed
+    ]
 
-            if label == 0:
-                rvi_base = np.random.uniform(0.55, 0.8)
-                rvi = rvi_base + 0.1 * np.sin(2 * np.pi * t) + np.random.normal(0, 0.03, seq_length)
-                vv = np.random.uniform(-12, -8) + np.random.normal(0, 0.5, seq_length)
-                vh = np.random.uniform(-18, -14) + np.random.normal(0, 0.5, seq_length)
+    X_blocks = []
+    y_blocks = []
+    for label, (rvi_lo, rvi_hi, trend, rvi_sigma, vv_lo, vv_hi, vh_lo, vh_hi, sar_sigma) in enumerate(class_params):
+        n = n_samples // 3
 
-            elif label == 1:
-                rvi_base = np.random.uniform(0.3, 0.55)
-                rvi = rvi_base + 0.05 * np.sin(2 * np.pi * t) + np.random.normal(0, 0.05, seq_length)
-                vv = np.random.uniform(-14, -10) + np.random.normal(0, 0.8, seq_length)
-                vh = np.random.uniform(-20, -16) + np.random.normal(0, 0.8, seq_length)
+        # Draw in float32 directly (uniform via scaled rng.random, normal via
+        # scaled standard_normal) so no FP64 intermediates are ever built.
+        def _uniform(lo, hi, shape):
+            return lo + (hi - lo) * rng.random(shape, dtype=np.float32)
 
-            else:
-                rvi_base = np.random.uniform(0.1, 0.3)
-                decline = -0.15 * t
-                rvi = rvi_base + decline + np.random.normal(0, 0.06, seq_length)
-                vv = np.random.uniform(-16, -12) + np.random.normal(0, 1.2, seq_length)
-                vh = np.random.uniform(-22, -18) + np.random.normal(0, 1.2, seq_length)
+        def _normal(sigma, shape):
+            return sigma * rng.standard_normal(shape, dtype=np.float32)
 
-            rvi = np.clip(rvi, 0, 1)
-            vv_vh_ratio = vv - vh
-            rvi_std = np.abs(np.random.normal(0.02 + label * 0.03, 0.01, seq_length))
+        rvi = _uniform(rvi_lo, rvi_hi, (n, 1)) + trend + _normal(rvi_sigma, (n, seq_length))
+        rvi = np.clip(rvi, 0, 1)
+        vv = _uniform(vv_lo, vv_hi, (n, 1)) + _normal(sar_sigma, (n, seq_length))
+        vh = _uniform(vh_lo, vh_hi, (n, 1)) + _normal(sar_sigma, (n, seq_length))
+        rvi_std = np.abs(0.02 + label * 0.03 + _normal(0.01, (n, seq_length)))
 
-            sample = np.column_stack([rvi, vv, vh, vv_vh_ratio, rvi_std])
-            X_all.append(sample)
-            y_all.append(label)
+        X_blocks.append(np.stack([rvi, vv, vh, vv - vh, rvi_std], axis=-1))
+        y_blocks.append(np.full(n, label, dtype=np.int64))
 
-    X = np.array(X_all, dtype=np.float32)
-    y = np.array(y_all, dtype=np.int64)
+    # No shuffle here: train_test_split(stratify=y, random_state=42) already
+    # randomizes the split, so a pre-permutation would just be an extra
+    # fancy-indexing copy of the whole dataset.
+    X = np.concatenate(X_blocks)
+    y = np.concatenate(y_blocks)
 
-    idx = np.random.permutation(len(X))
-    return X[idx], y[idx]
+    return X, y
 
 
 def load_real_data(csv_path: str):
-    df = pd.read_csv(csv_path)
-    labels = df["label"].values.astype(np.int64)
-
-    feature_cols = [c for c in df.columns if c != "label"]
+    # Read the header first so explicit dtypes can be passed to the full
+    # parse: features land directly in float32 (no FP64 pass + astype copy)
+    # and the pyarrow engine parses columns in parallel when installed.
+    header = pd.read_csv(csv_path, nrows=0)
+    feature_cols = [c for c in header.columns if c != "label"]
+    dtype = {"label": np.int64, **{c: np.float32 for c in feature_cols}}
+
+    try:
+        df = pd.read_csv(csv_path, dtype=dtype, engine="pyarrow")
+    except ImportError:
+        df = pd.read_csv(csv_path, dtype=dtype)
+
+    labels = df["label"].to_numpy()
     n_features = INPUT_SIZE
     seq_length = len(feature_cols) // n_features
 
-    features = df[feature_cols].values.astype(np.float32)
+    features = df[feature_cols].to_numpy(copy=False)
     X = features.reshape(-1, seq_length, n_features)
 
     return X, labels
@@ -100,22 +109,37 @@ def train():
     n_samples, seq_len, n_feat = X.shape
     X_flat = X.reshape(-1, n_feat)
 
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X_flat).reshape(n_samples, seq_len, n_feat)
+    # Normalization is baked into the model's feature_mean/feature_scale
+    # buffers below, so training runs on the raw features and no separate
+    # scaler artifact is shipped.
+    scaler = StandardScaler().fit(X_flat)
 
-    scaler_path = os.path.join(SAVE_DIR, "scaler.pkl")
-    joblib.dump(scaler, scaler_path)
-    print(f"[Train] Scaler saved to {scaler_path}")
+    stale_scaler_path = os.path.join(SAVE_DIR, "scaler.pkl")
+    if os.path.exists(stale_scaler_path):
+        os.remove(stale_scaler_path)
+        print("[Train] Removed stale scaler.pkl (normalization is in the model)")
 
     X_train, X_test, y_train, y_test = train_test_split(
-        X_scaled, y, test_size=0.2, random_state=42, stratify=y,
+        X, y, test_size=0.2, random_state=42, stratify=y,
     )
 
-    train_dataset = TensorDataset(torch.FloatTensor(X_train), torch.LongTensor(y_train))
-    test_dataset = TensorDataset(torch.FloatTensor(X_test), torch.LongTensor(y_test))
-
-    train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=True)
-    test_loader = DataLoader(test_dataset, batch_size=BATCH_SIZE, shuffle=False)
+    # X is already float32 and y int64, so from_numpy shares memory with the
+    # arrays instead of copying the whole training set.
+    train_dataset = TensorDataset(torch.from_numpy(X_train), torch.from_numpy(y_train))
+    test_dataset = TensorDataset(torch.from_numpy(X_test), torch.from_numpy(y_test))
+
+    num_workers = min(4, os.cpu_count() or 1)
+    pin_memory = torch.cuda.is_available()
+    train_loader = DataLoader(
+        train_dataset,
+        batch_size=BATCH_SIZE,
+        shuffle=True,
+        num_workers=num_workers,
+        pin_memory=pin_memory,
+        persistent_workers=num_workers > 0,
+        prefetch_factor=2 if num_workers > 0 else None,
+    )
+    test_loader = DataLoader(test_dataset, batch_size=BATCH_SIZE, shuffle=False, pin_memory=pin_memory)
 
     model = CropHealthLSTM(
         input_size=INPUT_SIZE,
@@ -125,59 +149,141 @@ def train():
         dropout=DROPOUT,
     )
 
+    with torch.no_grad():
+        model.feature_mean.copy_(torch.from_numpy(scaler.mean_.astype(np.float32)))
+        model.feature_scale.copy_(torch.from_numpy(scaler.scale_.astype(np.float32)))
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    if device.type == "cuda":
+        # Fixed (batch, 12, 5) shapes: let cuDNN pick the fastest LSTM algo.
+        torch.backends.cudnn.benchmark = True
+    model.to(device)
+    use_amp = device.type == "cuda"
+
     criterion = nn.CrossEntropyLoss()
-    optimizer = torch.optim.Adam(model.parameters(), lr=LEARNING_RATE)
-    scheduler = torch.optim.lr_scheduler.StepLR(optimizer, step_size=15, gamma=0.5)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=LEARNING_RATE, fused=use_amp)
+    # Linear warmup over the first epochs, then the usual step decay; the
+    # larger batch size needs the higher LR eased in.
+    scheduler = torch.optim.lr_scheduler.SequentialLR(
+        optimizer,
+        [
+            torch.optim.lr_scheduler.LinearLR(optimizer, start_factor=1 / 3, total_iters=WARMUP_EPOCHS),
+            torch.optim.lr_scheduler.StepLR(optimizer, step_size=15, gamma=0.5),
+        ],
+        milestones=[WARMUP_EPOCHS],
+    )
 
-    print(f"\n[Train] Starting training for {EPOCHS} epochs...")
+    print(f"\n[Train] Starting training for up to {EPOCHS} epochs...")
     best_accuracy = 0.0
+    patience = 10
+    epochs_since_improve = 0
 
     for epoch in range(EPOCHS):
         model.train()
-        total_loss = 0.0
-        correct = 0
+        # Tensor-resident accumulators: .item() forces a device sync, so it
+        # is paid once per epoch instead of once per batch.
+        running_loss = torch.zeros((), device=device)
+        running_correct = torch.zeros((), device=device, dtype=torch.long)
         total = 0
 
         for X_batch, y_batch in train_loader:
-            optimizer.zero_grad()
-            outputs = model(X_batch)
-            loss = criterion(outputs, y_batch)
+            X_batch = X_batch.to(device, non_blocking=True)
+            y_batch = y_batch.to(device, non_blocking=True)
+
+            optimizer.zero_grad(set_to_none=True)
+            # bf16 keeps the FP32 exponent range, so no GradScaler is needed.
+            with torch.autocast("cuda", dtype=torch.bfloat16, enabled=use_amp):
+                outputs = model(X_batch)
+                loss = criterion(outputs, y_batch)
             loss.backward()
             optimizer.step()
 
-            total_loss += loss.item()
+            running_loss += loss.detach()
             _, predicted = torch.max(outputs, 1)
             total += y_batch.size(0)
-            correct += (predicted == y_batch).sum().item()
+            running_correct += (predicted == y_batch).sum()
 
         scheduler.step()
-        train_acc = 100 * correct / total
-        avg_loss = total_loss / len(train_loader)
+        train_acc = 100 * running_correct.item() / total
+        avg_loss = running_loss.item() / len(train_loader)
+
+        # Evaluate every epoch (cheap on this dataset) so early stopping
+        # reacts promptly; only strict improvements touch disk.
+        model.eval()
+        test_correct = 0
+        test_total = 0
+
+        with torch.no_grad():
+            for X_batch, y_batch in test_loader:
+                X_batch = X_batch.to(device, non_blocking=True)
+                y_batch = y_batch.to(device, non_blocking=True)
+                outputs = model(X_batch)
+                _, predicted = torch.max(outputs, 1)
+                test_total += y_batch.size(0)
+                test_correct += (predicted == y_batch).sum().item()
+
+        test_acc = 100 * test_correct / test_total
 
         if (epoch + 1) % 5 == 0 or epoch == EPOCHS - 1:
-            model.eval()
-            test_correct = 0
-            test_total = 0
-
-            with torch.no_grad():
-                for X_batch, y_batch in test_loader:
-                    outputs = model(X_batch)
-                    _, predicted = torch.max(outputs, 1)
-                    test_total += y_batch.size(0)
-                    test_correct += (predicted == y_batch).sum().item()
-
-            test_acc = 100 * test_correct / test_total
             print(f"  Epoch [{epoch+1}/{EPOCHS}] Loss: {avg_loss:.4f} | Train Acc: {train_acc:.1f}% | Test Acc: {test_acc:.1f}%")
 
-            if test_acc > best_accuracy:
-                best_accuracy = test_acc
-                model_path = os.path.join(SAVE_DIR, "lstm_model.pt")
-                torch.save(model.state_dict(), model_path)
-                print(f"  → Best model saved ({test_acc:.1f}%)")
+        if test_acc > best_accuracy:
+            best_accuracy = test_acc
+            epochs_since_improve = 0
+            model_path = os.path.join(SAVE_DIR, "lstm_model.pt")
+            torch.save(model.state_dict(), model_path)
+            print(f"  → Best model saved ({test_acc:.1f}%)")
+        else:
+            epochs_since_improve += 1
+            if epochs_since_improve > patience:
+                print(f"  Early stopping at epoch {epoch+1}: no improvement in {patience} epochs")
+                break
+
+    # Export a TorchScript version of the best checkpoint so inference can
+    # skip Python dispatch entirely (small-batch latency is dispatch-bound).
+    model_path = os.path.join(SAVE_DIR, "lstm_model.pt")
+    if os.path.exists(model_path):
+        model.cpu()
+        model.load_state_dict(torch.load(model_path, map_location="cpu"))
+        model.eval()
+        scripted = torch.jit.script(model)
+        scripted_path = os.path.join(SAVE_DIR, "lstm_model_scripted.pt")
+        scripted.save(scripted_path)
+        print(f"[Train] Scripted model saved to {scripted_path}")
+
+        # Dynamic int8 weights route the LSTM/Linear matmuls through
+        # FBGEMM int8 kernels on CPU and shrink the artifact ~4x.
+        q_model = torch.quantization.quantize_dynamic(
+            model, {nn.LSTM, nn.Linear}, dtype=torch.qint8
+        )
+        int8_path = os.path.join(SAVE_DIR, "lstm_model_int8.pt")
+        torch.jit.save(torch.jit.script(q_model), int8_path)
+        print(f"[Train] Dynamic int8 model saved to {int8_path}")
+
+        # ONNX Runtime runs the LSTM through SIMD-optimized kernels with no
+        # Python/autograd overhead at all; export and int8-quantize when the
+        # onnxruntime tooling is available.
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            onnx_path = os.path.join(SAVE_DIR, "lstm_model.onnx")
+            torch.onnx.export(
+                model,
+                torch.zeros(1, SEQ_LENGTH, INPUT_SIZE),
+                onnx_path,
+                opset_version=17,
+                input_names=["x"],
+                output_names=["logits"],
+                dynamic_axes={"x": {0: "batch"}},
+            )
+            int8_onnx_path = os.path.join(SAVE_DIR, "lstm_model_int8.onnx")
+            quantize_dynamic(onnx_path, int8_onnx_path, weight_type=QuantType.QInt8)
+            print(f"[Train] ONNX int8 model saved to {int8_onnx_path}")
+        except Exception as e:
+            print(f"[Train] ONNX export skipped: {e}")
 
     print(f"\n[Train] Training complete. Best test accuracy: {best_accuracy:.1f}%")
     print(f"[Train] Model saved to {os.path.join(SAVE_DIR, 'lstm_model.pt')}")
-    print(f"[Train] Scaler saved to {scaler_path}")
 
 
 if __name__ == "__main__":